@@ -7,14 +7,23 @@ and concatenating them seamlessly.
 
 import asyncio
 import websockets
+import hashlib
 import json
 import uuid
 import time
 import os
 import sys
 import argparse
+import re
+import wave
 import requests
+from requests.adapters import HTTPAdapter, Retry
+import sqlite3
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+import aiofiles
+import aiohttp
 from pathlib import Path
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TimeElapsedColumn, TimeRemainingColumn
@@ -22,9 +31,221 @@ from rich.panel import Panel
 from rich.text import Text
 from dotenv import load_dotenv
 
+try:
+    # Python 3.11+
+    from asyncio import timeout as async_timeout
+except ImportError:
+    from async_timeout import timeout as async_timeout
+
+# How often the fallback file watcher checks the output file (seconds)
+FILE_POLL_INTERVAL = float(os.getenv("MUSICGPT_FILE_POLL_INTERVAL", "0.25"))
+
+# Shared HTTP session so downloads reuse one socket pool across clips
+_http_session = None
+
+async def _get_http_session():
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession()
+    return _http_session
+
+async def _close_http_session():
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
+
+# Pooled websocket connections keyed by URI, reused across clips and compositions
+_ws_pool = {}
+
+def _ws_alive(websocket):
+    """
+    True while the connection has not started closing
+    close_code exists on both the legacy protocol and the ClientConnection
+    returned by websockets >= 14, unlike the removed `.open` attribute
+    """
+    return websocket.close_code is None
+
+async def _acquire_ws(uri):
+    """
+    Return a healthy pooled websocket for `uri`, paying the handshake and the
+    initial Info-message drain only when no cached connection is available
+    """
+    pool = _ws_pool.setdefault(uri, [])
+    while pool:
+        websocket = pool.pop()
+        if _ws_alive(websocket):
+            return websocket
+        await websocket.close()
+
+    websocket = await websockets.connect(uri)
+
+    # Receive initial server messages
+    for _ in range(2):
+        message = await websocket.recv()
+        data = json.loads(message)
+        if "Info" in data:
+            print(f"Connected to: {data['Info']}")
+
+    return websocket
+
+def _release_ws(uri, websocket):
+    if _ws_alive(websocket):
+        _ws_pool.setdefault(uri, []).append(websocket)
+
+async def _close_ws_pool():
+    for pool in _ws_pool.values():
+        while pool:
+            await pool.pop().close()
+
+async def _run_composition(coro):
+    """
+    Run a composition coroutine and release pooled connections on exit
+    """
+    try:
+        return await coro
+    finally:
+        await _close_ws_pool()
+        await _close_http_session()
+
+def _file_ready(path, min_size):
+    """
+    Check whether `path` exists and exceeds `min_size` bytes with a single stat call
+    """
+    try:
+        return os.stat(path).st_size > min_size
+    except OSError:
+        return False
+
+class _NullProgress:
+    """
+    Drop-in Progress replacement for non-TTY runs: no render thread, no screen
+    redraws — progress is logged as plain lines at most once per 10% step
+    """
+    _MARKUP = re.compile(r'\[/?[a-z][a-z0-9 ._]*\]')
+
+    def __init__(self):
+        self._completed = {}
+        self._next_task = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add_task(self, description, total=100):
+        task = self._next_task
+        self._next_task += 1
+        self._completed[task] = 0.0
+        print(self._MARKUP.sub('', description))
+        return task
+
+    def update(self, task, completed=None, description=None):
+        if completed is not None:
+            # Only log every 10% so redirected output stays readable
+            if completed - self._completed.get(task, 0.0) < 10 and completed < 100:
+                return
+            self._completed[task] = completed
+        if description is not None:
+            print(self._MARKUP.sub('', description))
+
+def _concat_wavs(clip_files, out_path):
+    """
+    Concatenate same-format WAV clips by copying their raw PCM frames
+    Returns False when a clip cannot be parsed or the formats differ, so the
+    caller can fall back to FFmpeg
+    """
+    # Stage into a .part file and publish with an atomic rename, so a crash
+    # mid-concat can never leave a torn final file behind
+    part_path = out_path + ".part"
+    try:
+        with wave.open(clip_files[0], 'rb') as first:
+            params = first.getparams()
+
+        with wave.open(part_path, 'wb') as out:
+            out.setparams(params)
+            for clip_file in clip_files:
+                with wave.open(clip_file, 'rb') as clip:
+                    # nchannels, sampwidth and framerate must match for a raw copy
+                    if clip.getparams()[:3] != params[:3]:
+                        raise ValueError(f"{clip_file} has a different audio format")
+                    while True:
+                        frames = clip.readframes(1 << 18)
+                        if not frames:
+                            break
+                        out.writeframesraw(frames)
+
+        os.replace(part_path, out_path)
+        return True
+
+    except (wave.Error, ValueError, OSError, EOFError) as e:
+        print(f"[CONCATENATION] In-process WAV concat failed ({e}); falling back to FFmpeg")
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        return False
+
+async def _run_ffmpeg(cmd, timeout):
+    """
+    Run an FFmpeg command without blocking the event loop or accumulating its
+    log; only on failure re-run with stderr captured for the error report
+    Returns (returncode, stderr_text)
+    """
+    async def _run(stderr):
+        proc = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.DEVNULL, stderr=stderr)
+        try:
+            _, err = await asyncio.wait_for(proc.communicate(), timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        return proc.returncode, err
+
+    returncode, _ = await _run(asyncio.subprocess.DEVNULL)
+    if returncode == 0:
+        return 0, ""
+
+    returncode, err = await _run(asyncio.subprocess.PIPE)
+    return returncode, err.decode(errors='replace') if err else ""
+
+def _concat_escape(path):
+    """
+    Escape single quotes for the FFmpeg concat demuxer's quoted file directive
+    """
+    return path.replace("'", "'\\''")
+
+def _scan_clip_sizes(output_dir):
+    """
+    Map clip_*.wav filenames to sizes with one os.scandir pass (one stat per entry)
+    """
+    sizes = {}
+    try:
+        with os.scandir(output_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith('clip_') and entry.name.endswith('.wav') and entry.is_file():
+                    sizes[entry.name] = entry.stat().st_size
+    except FileNotFoundError:
+        pass
+    return sizes
+
+async def _watch_for_file(path, min_size, poll_interval=None):
+    """
+    Sleep until `path` exists and exceeds `min_size` bytes (fallback detection)
+    """
+    if poll_interval is None:
+        poll_interval = FILE_POLL_INTERVAL
+
+    while True:
+        if _file_ready(path, min_size):
+            return True
+        await asyncio.sleep(poll_interval)
+
 async def generate_single_clip(websocket, prompt, seconds, output_file, clip_number, total_clips, progress, task):
     """
     Generate a single music clip using MusicGPT WebSocket API
+    Returns (success, clean): `clean` is True only when the server finished
+    this generation (Result or Error received), meaning no stale frames can
+    arrive later and the connection is safe to pool for the next clip
     """
     generation_id = str(uuid.uuid4())
     chat_id = str(uuid.uuid4())
@@ -45,82 +266,107 @@ async def generate_single_clip(websocket, prompt, seconds, output_file, clip_num
     progress.update(task, description=f"[bold cyan]CLIP {clip_number}/{total_clips}[/bold cyan] - Request sent, monitoring progress...")
 
     generation_started = False
-    start_time = time.time()
     timeout = 600  # 10 minutes per clip
     last_progress = 0
 
-    while time.time() - start_time < timeout:
-        try:
-            # Check if file was created (fallback detection)
-            if os.path.exists(output_file):
-                file_size = os.path.getsize(output_file)
-                if file_size > 50000:  # >50KB (reasonable size for audio)
-                    progress.update(task, description=f"[bold green]CLIP {clip_number}/{total_clips} - File detected! Generation completed.[/bold green]")
-                    return True
-
-            # Set a timeout for receiving messages (check every 1 second)
-            message = await asyncio.wait_for(websocket.recv(), timeout=1.0)
-            data = json.loads(message)
-
-            if "Generation" in data:
-                gen_data = data["Generation"]
-
-                if "Start" in gen_data:
-                    progress.update(task, description=f"[bold cyan]CLIP {clip_number}/{total_clips}[/bold cyan] - Generation started!")
-                    generation_started = True
+    # Race a single long-lived recv() against the file watcher instead of
+    # waking up every second: the coroutine only runs when there is actual work
+    recv_task = asyncio.create_task(websocket.recv())
+    watch_task = asyncio.create_task(_watch_for_file(output_file, 50000))  # >50KB (reasonable size for audio)
 
-                elif "Progress" in gen_data:
-                    current_progress = gen_data["Progress"]["progress"] * 100
-                    if current_progress > last_progress:
-                        progress.update(task, completed=current_progress, description=f"[bold cyan]CLIP {clip_number}/{total_clips}[/bold cyan] - Generating...")
-                        last_progress = current_progress
-
-                elif "Result" in gen_data:
-                    progress.update(task, completed=100, description=f"[bold green]CLIP {clip_number}/{total_clips} - Generation completed![/bold green]")
-
-                    # Download the file
-                    file_path = gen_data["Result"]["relpath"]
-                    file_url = f"http://localhost:8642/files/{file_path}"
-
-                    progress.update(task, description=f"[bold cyan]CLIP {clip_number}/{total_clips}[/bold cyan] - Downloading file...")
-                    try:
-                        response = requests.get(file_url, timeout=30)
-                        response.raise_for_status()
-
-                        with open(output_file, 'wb') as f:
-                            f.write(response.content)
-
-                        file_size = len(response.content)
-                        progress.update(task, description=f"[bold green]CLIP {clip_number}/{total_clips} - Saved {file_size / 1024 / 1024:.2f} MB[/bold green]")
-                        return True
-
-                    except Exception as e:
-                        progress.update(task, description=f"[bold red]CLIP {clip_number}/{total_clips} - Download failed: {e}[/bold red]")
-                        return False
-
-                elif "Error" in gen_data:
-                    progress.update(task, description=f"[bold red]CLIP {clip_number}/{total_clips} - Generation failed: {gen_data['Error']['error']}[/bold red]")
-                    return False
-
-            elif "Chats" in data:
-                # Ignore chats messages
-                pass
-
-            elif "Error" in data:
-                progress.update(task, description=f"[bold red]CLIP {clip_number}/{total_clips} - Server error: {data['Error']}[/bold red]")
-                return False
+    try:
+        # async_timeout enforces the overall deadline without the per-call
+        # task creation that asyncio.wait_for incurs
+        async with async_timeout(timeout):
+            while True:
+                done, pending = await asyncio.wait(
+                    {recv_task, watch_task},
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if watch_task in done:
+                    # File was created (fallback detection). The Result frame
+                    # may still arrive on this socket, so it is not clean
+                    progress.update(task, description=f"[bold green]CLIP {clip_number}/{total_clips} - File detected! Generation completed.[/bold green]")
+                    return True, False
 
-        except asyncio.TimeoutError:
-            # No message received within timeout, continue checking
-            continue
+                message = recv_task.result()
+                recv_task = asyncio.create_task(websocket.recv())
+                data = json.loads(message)
 
-    # Timeout reached
+                if "Generation" in data:
+                    gen_data = data["Generation"]
+
+                    if "Start" in gen_data:
+                        progress.update(task, description=f"[bold cyan]CLIP {clip_number}/{total_clips}[/bold cyan] - Generation started!")
+                        generation_started = True
+
+                    elif "Progress" in gen_data:
+                        current_progress = gen_data["Progress"]["progress"] * 100
+                        if current_progress > last_progress:
+                            progress.update(task, completed=current_progress, description=f"[bold cyan]CLIP {clip_number}/{total_clips}[/bold cyan] - Generating...")
+                            last_progress = current_progress
+
+                    elif "Result" in gen_data:
+                        progress.update(task, completed=100, description=f"[bold green]CLIP {clip_number}/{total_clips} - Generation completed![/bold green]")
+
+                        # Download the file
+                        file_path = gen_data["Result"]["relpath"]
+                        file_url = f"http://localhost:8642/files/{file_path}"
+
+                        progress.update(task, description=f"[bold cyan]CLIP {clip_number}/{total_clips}[/bold cyan] - Downloading file...")
+                        # Stream into a .part file and publish with an atomic
+                        # rename, so an interrupted download can never leave a
+                        # truncated clip that a later run would reuse as-is
+                        part_file = output_file + ".part"
+                        try:
+                            # Stream straight to disk without blocking the event loop
+                            session = await _get_http_session()
+                            async with session.get(file_url, timeout=aiohttp.ClientTimeout(total=30)) as response:
+                                response.raise_for_status()
+
+                                async with aiofiles.open(part_file, 'wb') as f:
+                                    async for chunk in response.content.iter_chunked(1 << 20):
+                                        await f.write(chunk)
+
+                            os.replace(part_file, output_file)
+                            file_size = os.path.getsize(output_file)
+                            progress.update(task, description=f"[bold green]CLIP {clip_number}/{total_clips} - Saved {file_size / 1024 / 1024:.2f} MB[/bold green]")
+                            return True, True
+
+                        except Exception as e:
+                            # The generation itself finished, so the socket is clean
+                            progress.update(task, description=f"[bold red]CLIP {clip_number}/{total_clips} - Download failed: {e}[/bold red]")
+                            if os.path.exists(part_file):
+                                os.remove(part_file)
+                            return False, True
+
+                    elif "Error" in gen_data:
+                        progress.update(task, description=f"[bold red]CLIP {clip_number}/{total_clips} - Generation failed: {gen_data['Error']['error']}[/bold red]")
+                        return False, True
+
+                elif "Chats" in data:
+                    # Ignore chats messages
+                    pass
+
+                elif "Error" in data:
+                    progress.update(task, description=f"[bold red]CLIP {clip_number}/{total_clips} - Server error: {data['Error']}[/bold red]")
+                    return False, False
+
+    except asyncio.TimeoutError:
+        # Overall clip deadline reached, fall through to the timeout handling
+        pass
+    finally:
+        recv_task.cancel()
+        watch_task.cancel()
+
+    # Timeout reached; the server may still emit frames for this generation
     if not generation_started:
         progress.update(task, description=f"[bold red]CLIP {clip_number}/{total_clips} - Generation never started[/bold red]")
-        return False
+        return False, False
     else:
         progress.update(task, description=f"[bold red]CLIP {clip_number}/{total_clips} - Generation timeout[/bold red]")
-        return False
+        return False, False
 
 async def generate_composition_sequential(base_prompt, num_clips, seconds_per_clip, output_dir, final_name):
     """
@@ -136,15 +382,16 @@ async def generate_composition_sequential(base_prompt, num_clips, seconds_per_cl
 
     return await generate_clips_and_concatenate(base_prompt, num_clips, seconds_per_clip, output_dir, final_name, strategy="sequential")
 
-async def generate_composition_hierarchical(base_prompt, structure_name, seconds_per_section, output_dir, final_name):
+async def generate_composition_hierarchical(base_prompt, structure_name, seconds_per_section, output_dir, final_name, sections=None):
     """
     Generate a complete music composition using Strategy 3: Hierarchical Generation
     """
     print("🎵 STRATEGY 3: Hierarchical Generation with Structure")
     print("=" * 60)
 
-    # Generate section definitions
-    sections = generate_hierarchical_sections(base_prompt, structure_name, seconds_per_section)
+    # Generate section definitions (unless the caller already built them)
+    if sections is None:
+        sections = generate_hierarchical_sections(base_prompt, structure_name, seconds_per_section)
     num_sections = len(sections)
     total_duration = num_sections * seconds_per_section
 
@@ -172,7 +419,7 @@ async def generate_composition_ai_sequential(base_prompt, num_clips, seconds_per
     print("=" * 60)
 
     # Generate AI prompts for sequential composition
-    ai_prompts, sliding_window_contexts = generate_ai_prompts(base_prompt, num_clips)
+    ai_prompts, sliding_window_contexts = await generate_ai_prompts(base_prompt, num_clips)
 
     print(f"Creating {num_clips} clips × {seconds_per_clip}s = {num_clips * seconds_per_clip}s total composition")
     print(f"Base prompt: {base_prompt}")
@@ -198,7 +445,7 @@ async def generate_composition_ai_hierarchical(base_prompt, structure_name, seco
     print("=" * 60)
 
     # Generate section definitions with AI prompts
-    sections = generate_ai_sections(base_prompt, structure_name, seconds_per_section)
+    sections = await generate_ai_sections(base_prompt, structure_name, seconds_per_section)
     num_sections = len(sections)
     total_duration = num_sections * seconds_per_section
 
@@ -220,6 +467,79 @@ async def generate_composition_ai_hierarchical(base_prompt, structure_name, seco
     return await generate_clips_and_concatenate(base_prompt, num_sections, seconds_per_section, output_dir, final_name,
                                                strategy="ai_hierarchical", sections=sections, structure_name=structure_name)
 
+def _write_prompts_report(prompts_path, strategy, structure_name, base_prompt, num_clips, seconds_per_clip, used_prompts):
+    """
+    Assemble the prompts report in memory and write it with a single call
+    """
+    parts = [
+        "MusicCreator - Prompts Sent to MusicGPT\n",
+        f"{'='*50}\n\n",
+        f"Generation Strategy: {strategy.title()}\n",
+    ]
+    if strategy in ["hierarchical", "ai_hierarchical"]:
+        parts.append(f"Musical Structure: {structure_name.upper()}\n")
+    parts.extend([
+        f"Base Prompt: {base_prompt}\n",
+        f"Total Duration: {num_clips * seconds_per_clip} seconds\n",
+        f"Generated: {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n",
+        "Prompts Sent to MusicGPT:\n",
+        f"{'-'*25}\n\n",
+    ])
+
+    for prompt_data in used_prompts:
+        parts.extend([
+            f"Clip {prompt_data['clip_number']}: {prompt_data['section_info']}\n",
+            f"Duration: {prompt_data['duration']} seconds\n",
+            f"File: {prompt_data['filename']}\n",
+            "Prompt Sent to MusicGPT:\n",
+            f"<StartMusicGPT>\n{prompt_data['prompt']}\n<EndMusicGPT>\n\n",
+            f"{'-'*50}\n\n",
+        ])
+
+    Path(prompts_path).write_text("".join(parts), encoding='utf-8')
+
+def _build_clip_plan(strategy, base_prompt, num_clips, seconds_per_clip, output_dir,
+                     sections=None, ai_prompts=None, sliding_window_contexts=None):
+    """
+    Build the per-clip prompt plan for a strategy in one pass
+    """
+    clip_plan = []
+    for i in range(1, num_clips + 1):
+        if strategy == "sequential":
+            if i == 1:
+                # First clip uses base prompt
+                prompt = base_prompt
+            else:
+                # Subsequent clips use continuation prompts
+                prompt = f"{base_prompt}, continuation part {i}, maintaining the same emotional depth and style"
+            section_info = f"CLIP {i}/{num_clips}"
+        elif strategy == "ai_sequential":
+            # Use the full sliding window context + base prompt + scene prompt for MusicGPT
+            context_text = sliding_window_contexts[i-1].context_text
+            if context_text.strip():
+                # Include previous scenes context in the prompt sent to MusicGPT
+                prompt = f"{base_prompt}\n\n{context_text}\n\nCurrent scene: {ai_prompts[i-1]}"
+            else:
+                # First scene has no previous context
+                prompt = ai_prompts[i-1]
+            section_info = f"CLIP {i}/{num_clips} (AI Sliding Window)"
+        else:  # hierarchical or ai_hierarchical
+            section = sections[i-1]
+            prompt = section['prompt']
+            section_info = f"SECTION {i}/{num_clips} ({section['id'].upper()}: {section['description']})"
+
+        clip_filename = f"clip_{i:02d}.wav"
+        clip_plan.append({
+            'clip_number': i,
+            'section_info': section_info,
+            'prompt': prompt,
+            'duration': seconds_per_clip,
+            'filename': clip_filename,
+            'clip_path': os.path.join(output_dir, clip_filename)
+        })
+
+    return clip_plan
+
 async def generate_clips_and_concatenate(base_prompt, num_clips, seconds_per_clip, output_dir, final_name, strategy="sequential", sections=None, structure_name=None, ai_prompts=None, sliding_window_contexts=None):
     """
     Common function for generating clips and concatenating them
@@ -237,337 +557,277 @@ async def generate_clips_and_concatenate(base_prompt, num_clips, seconds_per_cli
             print("Skipping generation. Delete the file to regenerate.")
 
             # Still generate and save prompts for documentation
-            used_prompts = []
-            num_clips = len([f for f in os.listdir(output_dir) if f.startswith('clip_') and f.endswith('.wav')])
-
-            for i in range(1, num_clips + 1):
-                if strategy == "sequential":
-                    if i == 1:
-                        prompt = base_prompt
-                    else:
-                        prompt = f"{base_prompt}, continuation part {i}, maintaining the same emotional depth and style"
-                    section_info = f"CLIP {i}/{num_clips}"
-                else:  # hierarchical
-                    section = sections[i-1]
-                    prompt = section['prompt']
-                    section_info = f"SECTION {i}/{num_clips} ({section['id'].upper()}: {section['description']})"
-
-                clip_filename = f"clip_{i:02d}.wav"
-                used_prompts.append({
-                    'clip_number': i,
-                    'section_info': section_info,
-                    'prompt': prompt,
-                    'duration': seconds_per_clip,
-                    'filename': clip_filename
-                })
+            num_clips = sum(1 for size in _scan_clip_sizes(output_dir).values() if size > 50000)  # >50KB
+            used_prompts = _build_clip_plan(strategy, base_prompt, num_clips, seconds_per_clip, output_dir,
+                                            sections=sections, ai_prompts=ai_prompts,
+                                            sliding_window_contexts=sliding_window_contexts)
 
             # Save prompts to text file
             prompts_filename = final_name.replace('.wav', '_prompts.txt')
             prompts_path = os.path.join(output_dir, prompts_filename)
 
             print(f"\n[PROMPTS] Saving generation prompts to: {prompts_filename}")
-            with open(prompts_path, 'w', encoding='utf-8') as f:
-                f.write(f"MusicCreator Composition Prompts\n")
-                f.write(f"{'='*50}\n\n")
-                f.write(f"Generation Strategy: {strategy.title()}\n")
-                if strategy == "hierarchical":
-                    f.write(f"Musical Structure: {structure_name.upper()}\n")
-                f.write(f"Base Prompt: {base_prompt}\n")
-                f.write(f"Total Duration: {num_clips * seconds_per_clip} seconds\n")
-                f.write(f"Generated: {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-
-                f.write(f"Individual Section Prompts:\n")
-                f.write(f"{'-'*30}\n\n")
-
-                for prompt_data in used_prompts:
-                    f.write(f"Section {prompt_data['clip_number']}: {prompt_data['section_info']}\n")
-                    f.write(f"Duration: {prompt_data['duration']} seconds\n")
-                    f.write(f"File: {prompt_data['filename']}\n")
-                    f.write(f"Prompt: {prompt_data['prompt']}\n\n")
-
+            _write_prompts_report(prompts_path, strategy, structure_name, base_prompt,
+                                  num_clips, seconds_per_clip, used_prompts)
             print(f"[PROMPTS] Successfully saved prompts to {prompts_filename}")
             return True
 
+    # Fail fast if MusicGPT or FFmpeg turned out to be unavailable
+    _await_preflight()
+
     uri = "ws://localhost:8642/ws"
 
+    # How many clips may generate against the server at once
+    max_parallel = int(os.getenv("MUSICGPT_PARALLEL_CLIPS", "2"))
+
+    # Build the full clip plan up front so independent clips can run concurrently
+    clip_plan = _build_clip_plan(strategy, base_prompt, num_clips, seconds_per_clip, output_dir,
+                                 sections=sections, ai_prompts=ai_prompts,
+                                 sliding_window_contexts=sliding_window_contexts)
+
     try:
-        async with websockets.connect(uri) as websocket:
-            # Receive initial server messages
-            print("Connecting to MusicGPT...")
-            for _ in range(2):
-                message = await websocket.recv()
-                data = json.loads(message)
-                if "Info" in data:
-                    print(f"Connected to: {data['Info']}")
+        results = {}  # clip_number -> success
+        semaphore = asyncio.Semaphore(max_parallel)
+
+        async def run_clip(entry):
+            # Each clip gets its own pooled connection so generations can overlap
+            async with semaphore:
+                websocket = await _acquire_ws(uri)
+                clean = False
+                try:
+                    task = progress.add_task(f"[bold cyan]{entry['section_info']}[/bold cyan] - Initializing...", total=100)
 
-            clip_files = []
-            success_count = 0
-            used_prompts = []  # Track all prompts used
+                    success, clean = await generate_single_clip(websocket, entry['prompt'], seconds_per_clip,
+                                                                entry['clip_path'], entry['clip_number'], num_clips,
+                                                                progress, task)
 
-            # Create progress bar for individual clips
-            with Progress(
+                    if success:
+                        progress.update(task, completed=100, description=f"[bold green]{entry['section_info']} - Completed![/bold green]")
+                    else:
+                        progress.update(task, description=f"[bold red]{entry['section_info']} - Failed![/bold red]")
+                    return success
+                finally:
+                    if clean:
+                        _release_ws(uri, websocket)
+                    else:
+                        # Stale Generation frames may still arrive on this
+                        # socket; pooling it could hand the next clip a
+                        # Result belonging to the previous generation
+                        await websocket.close()
+
+        print("Connecting to MusicGPT...")
+
+        # Create progress bar for individual clips; headless/redirected runs
+        # get plain log lines instead of a 2Hz render thread
+        console = Console()
+        if console.is_terminal:
+            progress_ctx = Progress(
                 SpinnerColumn(),
                 TextColumn("[progress.description]{task.description}"),
                 BarColumn(),
                 TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
                 TimeElapsedColumn(),
                 TimeRemainingColumn(),
-                console=Console(),
+                console=console,
                 refresh_per_second=2
-            ) as progress:
-
-                # Generate each clip/section
-                for i in range(1, num_clips + 1):
-                    if strategy == "sequential":
-                        if i == 1:
-                            # First clip uses base prompt
-                            prompt = base_prompt
-                        else:
-                            # Subsequent clips use continuation prompts
-                            prompt = f"{base_prompt}, continuation part {i}, maintaining the same emotional depth and style"
-                        section_info = f"CLIP {i}/{num_clips}"
-                    elif strategy == "ai_sequential":
-                        # Use the full sliding window context + base prompt + scene prompt for MusicGPT
-                        context_text = sliding_window_contexts[i-1]['context_text']
-                        if context_text.strip():
-                            # Include previous scenes context in the prompt sent to MusicGPT
-                            prompt = f"{base_prompt}\n\n{context_text}\n\nCurrent scene: {ai_prompts[i-1]}"
-                        else:
-                            # First scene has no previous context
-                            prompt = ai_prompts[i-1]
-                        section_info = f"CLIP {i}/{num_clips} (AI Sliding Window)"
-                    else:  # hierarchical or ai_hierarchical
-                        section = sections[i-1]
-                        prompt = section['prompt']
-                        section_info = f"SECTION {i}/{num_clips} ({section['id'].upper()}: {section['description']})"
-
-                    clip_filename = f"clip_{i:02d}.wav"
-                    clip_path = os.path.join(output_dir, clip_filename)
-
-                    # Check if clip already exists
-                    if os.path.exists(clip_path):
-                        file_size = os.path.getsize(clip_path)
-                        if file_size > 50000:  # >50KB
-                            print(f"[{section_info}] Using existing clip: {clip_filename}")
-                            clip_files.append(clip_path)
-                            # Track the prompt that would have been used for this clip/section
-                            used_prompts.append({
-                                'clip_number': i,
-                                'section_info': section_info,
-                                'prompt': prompt,
-                                'duration': seconds_per_clip,
-                                'filename': clip_filename
-                            })
-                            success_count += 1
-                            continue
-
-                    # Create progress task for this clip
-                    task = progress.add_task(f"[bold cyan]{section_info}[/bold cyan] - Initializing...", total=100)
-
-                    # Generate new clip
-                    success = await generate_single_clip(websocket, prompt, seconds_per_clip, clip_path, i, num_clips, progress, task)
-
-                    if success:
-                        clip_files.append(clip_path)
-                        # Track the prompt used for this clip/section
-                        used_prompts.append({
-                            'clip_number': i,
-                            'section_info': section_info,
-                            'prompt': prompt,
-                            'duration': seconds_per_clip,
-                            'filename': clip_filename
-                        })
-                        success_count += 1
-                        progress.update(task, completed=100, description=f"[bold green]{section_info} - Completed![/bold green]")
-                    else:
-                        progress.update(task, description=f"[bold red]{section_info} - Failed![/bold red]")
-                        print(f"[ERROR] Failed to generate {section_info.lower()}")
-                        return False
+            )
+        else:
+            progress_ctx = _NullProgress()
 
-                    # Small delay between clips to avoid overwhelming the server
-                    if i < num_clips:
-                        print(f"[INFO] Waiting 2 seconds before next clip...")
-                        await asyncio.sleep(2)
+        with progress_ctx as progress:
 
-            print(f"\n[SUMMARY] Generated {success_count}/{num_clips} clips successfully")
+            # Reuse clips that already exist (one directory scan instead of a stat per clip)
+            existing_sizes = _scan_clip_sizes(output_dir)
+            pending = []
+            for entry in clip_plan:
+                if existing_sizes.get(entry['filename'], 0) > 50000:  # >50KB
+                    print(f"[{entry['section_info']}] Using existing clip: {entry['filename']}")
+                    results[entry['clip_number']] = True
+                else:
+                    pending.append(entry)
+
+            tasks = [asyncio.create_task(run_clip(entry)) for entry in pending]
+
+            for entry, success in zip(pending, await asyncio.gather(*tasks)):
+                results[entry['clip_number']] = success
+                if not success:
+                    print(f"[ERROR] Failed to generate {entry['section_info'].lower()}")
+
+        # Collect results in clip order
+        clip_files = []
+        used_prompts = []  # Track all prompts used
+        success_count = 0
+        for entry in clip_plan:
+            if results.get(entry['clip_number']):
+                clip_files.append(entry['clip_path'])
+                used_prompts.append(entry)
+                success_count += 1
+
+        print(f"\n[SUMMARY] Generated {success_count}/{num_clips} clips successfully")
+
+        if success_count != num_clips:
+            print("[ERROR] Not all clips generated successfully")
+            return False
+
+        # Concatenate all clips
+        print("\n[CONCATENATION] Combining all clips into final composition...")
+        print(f"Input clips: {len(clip_files)}")
+        print(f"Output file: {final_path}")
+
+        # Create file list for FFmpeg (built in one string, written in one call);
+        # absolute paths with -safe 0 keep the invocation independent of the cwd
+        file_list_path = os.path.abspath(os.path.join(output_dir, "file_list.txt"))
+        abs_paths = [os.path.abspath(clip_file) for clip_file in clip_files]
+        with open(file_list_path, 'w') as f:
+            f.write("".join(f"file '{_concat_escape(abs_path)}'\n" for abs_path in abs_paths))
+
+        # Save prompts to text file
+        prompts_filename = final_name.replace('.wav', '_prompts.txt')
+        prompts_path = os.path.abspath(os.path.join(output_dir, prompts_filename))
 
-            if success_count != num_clips:
-                print("[ERROR] Not all clips generated successfully")
-                return False
+        print(f"\n[PROMPTS] Saving generation prompts to: {prompts_path}")
+        try:
+            # Ensure output directory exists
+            os.makedirs(output_dir, exist_ok=True)
 
-            # Concatenate all clips
-            print("\n[CONCATENATION] Combining all clips into final composition...")
-            print(f"Input clips: {len(clip_files)}")
-            print(f"Output file: {final_path}")
+            _write_prompts_report(prompts_path, strategy, structure_name, base_prompt,
+                                  num_clips, seconds_per_clip, used_prompts)
+            print(f"[PROMPTS] Successfully saved prompts to {prompts_filename}")
+        except Exception as e:
+            print(f"[ERROR] Failed to save prompts file: {e}")
+            # Don't fail the entire composition for prompts saving error
+            print("[INFO] Composition files were created successfully, but prompts documentation failed")
 
-            # Create file list for FFmpeg
-            file_list_path = os.path.join(output_dir, "file_list.txt")
-            with open(file_list_path, 'w') as f:
-                for clip_file in clip_files:
-                    # Use relative path from output directory
-                    rel_path = os.path.relpath(clip_file, output_dir)
-                    f.write(f"file '{rel_path}'\n")
+        # Concatenate the raw PCM in-process first: MusicGPT clips share one
+        # format, so this is a header rewrite plus frame copies with no decode
+        # and no subprocess. FFmpeg handles the MP3 encode, or the full concat
+        # as fallback when the clips disagree on format.
+        concat_ok = await asyncio.to_thread(_concat_wavs, clip_files, final_path)
 
-            # Save prompts to text file before changing working directory
-            prompts_filename = final_name.replace('.wav', '_prompts.txt')
-            prompts_path = os.path.abspath(os.path.join(output_dir, prompts_filename))
-
-            print(f"\n[PROMPTS] Saving generation prompts to: {prompts_path}")
-            try:
-                # Ensure output directory exists
-                os.makedirs(output_dir, exist_ok=True)
-
-                with open(prompts_path, 'w', encoding='utf-8') as f:
-                    f.write(f"MusicCreator - Prompts Sent to MusicGPT\n")
-                    f.write(f"{'='*50}\n\n")
-                    f.write(f"Generation Strategy: {strategy.title()}\n")
-                    if strategy in ["hierarchical", "ai_hierarchical"]:
-                        f.write(f"Musical Structure: {structure_name.upper()}\n")
-                    f.write(f"Base Prompt: {base_prompt}\n")
-                    f.write(f"Total Duration: {num_clips * seconds_per_clip} seconds\n")
-                    f.write(f"Generated: {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-
-                    f.write(f"Prompts Sent to MusicGPT:\n")
-                    f.write(f"{'-'*25}\n\n")
-
-                    for prompt_data in used_prompts:
-                        f.write(f"Clip {prompt_data['clip_number']}: {prompt_data['section_info']}\n")
-                        f.write(f"Duration: {prompt_data['duration']} seconds\n")
-                        f.write(f"File: {prompt_data['filename']}\n")
-                        f.write(f"Prompt Sent to MusicGPT:\n")
-                        f.write(f"<StartMusicGPT>\n{prompt_data['prompt']}\n<EndMusicGPT>\n\n")
-                        f.write(f"{'-'*50}\n\n")
-
-                print(f"[PROMPTS] Successfully saved prompts to {prompts_filename}")
-            except Exception as e:
-                print(f"[ERROR] Failed to save prompts file: {e}")
-                # Don't fail the entire composition for prompts saving error
-                print("[INFO] Composition files were created successfully, but prompts documentation failed")
-
-            # Run FFmpeg concatenation from output directory
-            original_dir = os.getcwd()
-            os.chdir(output_dir)
-
-            try:
+        try:
+            # FFmpeg writes into .part files (with explicit muxers, since the
+            # format can't be inferred from the staged names) that are renamed
+            # into place only on success. All paths are absolute: no os.chdir,
+            # so concurrent compositions can't race on the process-wide cwd.
+            abs_final_path = os.path.abspath(final_path)
+            mp3_name = final_name.replace('.wav', '.mp3')
+            mp3_path = os.path.abspath(os.path.join(output_dir, mp3_name))
+            if concat_ok:
                 cmd = [
-                    "ffmpeg", "-f", "concat", "-safe", "0",
-                    "-i", "file_list.txt", "-c", "copy", final_name
+                    "ffmpeg", "-y", "-i", abs_final_path,
+                    "-c:a", "libmp3lame", "-qscale:a", "2",
+                    "-f", "mp3", mp3_path + ".part"
+                ]
+            else:
+                # Demux the clips once and fan out to both outputs
+                cmd = [
+                    "ffmpeg", "-y", "-f", "concat", "-safe", "0",
+                    "-i", file_list_path,
+                    "-map", "0", "-c:a", "copy", "-f", "wav", abs_final_path + ".part",
+                    "-map", "0", "-c:a", "libmp3lame", "-qscale:a", "2",
+                    "-f", "mp3", mp3_path + ".part"
                 ]
 
-                print(f"[CONCATENATION] Running: {' '.join(cmd)}")
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-
-                if result.returncode == 0:
-                    # Check final file
-                    if os.path.exists(final_name):
-                        final_size = os.path.getsize(final_name)
-                        expected_duration = num_clips * seconds_per_clip
-
-                        print("\n[CONCATENATION] SUCCESS!")
-                        print(f"Final file: {final_name}")
-                        print(f"Size: {final_size / 1024 / 1024:.2f} MB")
-                        print(f"Expected duration: ~{expected_duration} seconds")
-
-                        # Get actual duration using FFmpeg
-                        duration_cmd = ["ffmpeg", "-i", final_name, "-f", "null", "-"]
-                        duration_result = subprocess.run(duration_cmd, capture_output=True, text=True)
-
-                        # Extract duration from output
-                        for line in duration_result.stderr.split('\n'):
-                            if 'Duration:' in line:
-                                duration_str = line.split('Duration:')[1].split(',')[0].strip()
-                                print(f"Actual duration: {duration_str}")
-                                break
-
-                        # Generate MP3 version
-                        mp3_name = final_name.replace('.wav', '.mp3')
-
-                        print(f"\n[MP3 CONVERSION] Creating MP3 version: {mp3_name}")
-                        mp3_cmd = [
-                            "ffmpeg", "-i", final_name,
-                            "-codec:a", "libmp3lame", "-qscale:a", "2",
-                            mp3_name
-                        ]
-
-                        print(f"[MP3] Running: {' '.join(mp3_cmd)}")
-                        mp3_result = subprocess.run(mp3_cmd, capture_output=True, text=True, timeout=300)
-
-                        if mp3_result.returncode == 0 and os.path.exists(mp3_name):
-                            mp3_size = os.path.getsize(mp3_name)
-                            print(f"[MP3] SUCCESS! Created {mp3_name} ({mp3_size / 1024 / 1024:.2f} MB)")
-                        else:
-                            print("[MP3] Conversion failed, but WAV file is available")
-
-                        print("\n🎵 COMPOSITION COMPLETE!")
-                        print(f"WAV File: {os.path.join(output_dir, final_name)}")
-                        print(f"MP3 File: {os.path.join(output_dir, mp3_name)}")
-                        if strategy == "sequential":
-                            print(f"Strategy: Sequential Generation")
-                            print(f"Total clips: {num_clips}")
-                            print(f"Clip duration: {seconds_per_clip}s each")
-                        else:
-                            print(f"Strategy: Hierarchical Generation")
-                            print(f"Structure: {sections[0]['id'].split('_')[0] if sections else 'Unknown'}")  # Extract structure name
-                            print(f"Total sections: {num_clips}")
-                            print(f"Section duration: {seconds_per_clip}s each")
-                        print(f"Total duration: {expected_duration}s")
-                        print(f"Style: {base_prompt.split(',')[0] if ',' in base_prompt else base_prompt}")
-
-                        return True
+            print(f"[CONCATENATION] Running: {' '.join(cmd)}")
+            returncode, ffmpeg_stderr = await _run_ffmpeg(cmd, timeout=300)
+
+            if returncode == 0:
+                # Publish the staged outputs atomically
+                if not concat_ok:
+                    os.replace(abs_final_path + ".part", abs_final_path)
+                os.replace(mp3_path + ".part", mp3_path)
+
+                # Check final file
+                if os.path.exists(abs_final_path):
+                    final_size = os.path.getsize(abs_final_path)
+                    expected_duration = num_clips * seconds_per_clip
+
+                    print("\n[CONCATENATION] SUCCESS!")
+                    print(f"Final file: {final_name}")
+                    print(f"Size: {final_size / 1024 / 1024:.2f} MB")
+                    print(f"Expected duration: ~{expected_duration} seconds")
+
+                    # Get actual duration from the headers via ffprobe (no
+                    # decode pass). Best-effort: both outputs are already
+                    # published, so a slow or missing probe must not turn the
+                    # finished composition into a failure
+                    duration_cmd = [
+                        "ffprobe", "-v", "error",
+                        "-show_entries", "format=duration",
+                        "-of", "default=nw=1:nk=1", abs_final_path
+                    ]
+                    try:
+                        duration_proc = await asyncio.create_subprocess_exec(
+                            *duration_cmd,
+                            stdout=asyncio.subprocess.PIPE,
+                            stderr=asyncio.subprocess.DEVNULL
+                        )
+                        try:
+                            duration_out, _ = await asyncio.wait_for(duration_proc.communicate(), 10)
+                        except asyncio.TimeoutError:
+                            duration_proc.kill()
+                            await duration_proc.wait()
+                            raise
+                        print(f"Actual duration: {float(duration_out.strip()):.1f} seconds")
+                    except (asyncio.TimeoutError, ValueError, OSError):
+                        pass
+
+                    # MP3 version was produced by the same FFmpeg invocation
+                    if os.path.exists(mp3_path):
+                        mp3_size = os.path.getsize(mp3_path)
+                        print(f"[MP3] SUCCESS! Created {mp3_name} ({mp3_size / 1024 / 1024:.2f} MB)")
                     else:
-                        print("[ERROR] Final file was not created")
-                        return False
+                        print("[MP3] Conversion failed, but WAV file is available")
+
+                    print("\n🎵 COMPOSITION COMPLETE!")
+                    print(f"WAV File: {os.path.join(output_dir, final_name)}")
+                    print(f"MP3 File: {os.path.join(output_dir, mp3_name)}")
+                    if strategy == "sequential":
+                        print(f"Strategy: Sequential Generation")
+                        print(f"Total clips: {num_clips}")
+                        print(f"Clip duration: {seconds_per_clip}s each")
+                    else:
+                        print(f"Strategy: Hierarchical Generation")
+                        print(f"Structure: {sections[0]['id'].split('_')[0] if sections else 'Unknown'}")  # Extract structure name
+                        print(f"Total sections: {num_clips}")
+                        print(f"Section duration: {seconds_per_clip}s each")
+                    print(f"Total duration: {expected_duration}s")
+                    print(f"Style: {base_prompt.split(',')[0] if ',' in base_prompt else base_prompt}")
+
+                    return True
                 else:
-                    print("[ERROR] FFmpeg concatenation failed")
-                    print("STDOUT:", result.stdout)
-                    print("STDERR:", result.stderr)
+                    print("[ERROR] Final file was not created")
                     return False
-
-            except subprocess.TimeoutExpired:
-                print("[ERROR] FFmpeg concatenation timed out")
+            else:
+                if concat_ok:
+                    # The WAV is already published; only the MP3 encode failed
+                    print("[MP3] Conversion failed, but WAV file is available")
+                    print("STDERR:", ffmpeg_stderr)
+                    if os.path.exists(mp3_path + ".part"):
+                        os.remove(mp3_path + ".part")
+                    return True
+                print("[ERROR] FFmpeg concatenation failed")
+                print("STDERR:", ffmpeg_stderr)
                 return False
-            finally:
-                os.chdir(original_dir)
 
-                # Clean up file list
-                if os.path.exists(file_list_path):
-                    os.remove(file_list_path)
+        except (subprocess.TimeoutExpired, asyncio.TimeoutError):
+            if concat_ok:
+                print("[ERROR] FFmpeg MP3 conversion timed out")
+                print("[MP3] Conversion failed, but WAV file is available")
+                if os.path.exists(mp3_path + ".part"):
+                    os.remove(mp3_path + ".part")
+                return True
+            print("[ERROR] FFmpeg concatenation timed out")
+            return False
+        finally:
+            # Clean up file list
+            if os.path.exists(file_list_path):
+                os.remove(file_list_path)
 
     except Exception as e:
         print(f"[ERROR] WebSocket connection failed: {e}")
         return False
 
-    # Save prompts to text file (outside WebSocket context)
-    try:
-        prompts_filename = final_name.replace('.wav', '_prompts.txt')
-        prompts_path = os.path.join(output_dir, prompts_filename)
-
-        print(f"\n[PROMPTS] Saving generation prompts to: {prompts_filename}")
-        with open(prompts_path, 'w', encoding='utf-8') as f:
-            f.write(f"MusicCreator Composition Prompts\n")
-            f.write(f"{'='*50}\n\n")
-            f.write(f"Generation Strategy: {strategy.title()}\n")
-            if strategy in ["hierarchical", "ai_hierarchical"]:
-                f.write(f"Musical Structure: {structure_name.upper()}\n")
-            f.write(f"Base Prompt: {base_prompt}\n")
-            f.write(f"Total Duration: {num_clips * seconds_per_clip} seconds\n")
-            f.write(f"Generated: {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-
-            f.write(f"Individual Section Prompts:\n")
-            f.write(f"{'-'*30}\n\n")
-
-            for prompt_data in used_prompts:
-                f.write(f"Section {prompt_data['clip_number']}: {prompt_data['section_info']}\n")
-                f.write(f"Duration: {prompt_data['duration']} seconds\n")
-                f.write(f"File: {prompt_data['filename']}\n")
-                f.write(f"Prompt: {prompt_data['prompt']}\n\n")
-
-        print(f"[PROMPTS] Successfully saved prompts to {prompts_filename}")
-    except Exception as e:
-        print(f"[ERROR] Failed to save prompts file: {e}")
-        # Don't fail the entire composition for prompts saving error
-        print("[INFO] Composition files were created successfully, but prompts documentation failed")
-
 # Define musical structures for hierarchical generation
 MUSICAL_STRUCTURES = {
     "simple": [
@@ -615,63 +875,113 @@ def generate_hierarchical_sections(base_prompt, structure_name, seconds_per_sect
 
     return sections
 
-def generate_ai_prompts(base_prompt, num_clips, structure_name=None):
-    """
-    Generate coherent and interesting prompts using OpenRouter AI with base prompt + sliding window scene approach
-    Uses a fixed base prompt for general music/song setup, then adds scene-specific prompts via sliding window
-    Returns both the final prompts and the sliding window context for documentation
-    """
-    # Load environment variables
-    load_dotenv()
-    api_key = os.getenv('OPENROUTER_API_KEY')
-    model = os.getenv('OPENROUTER_MODEL', 'x-ai/grok-4-fast')
-
-    if not api_key:
-        raise ValueError("OPENROUTER_API_KEY not found in .env file")
+# Disk cache for AI-generated prompts: the results are fully determined by
+# (base_prompt, num_prompts, structure_name, model), so re-runs skip OpenRouter
+_PROMPT_CACHE_DIR = Path.home() / ".cache" / "musiccreator" / "prompts"
 
-    # Determine number of prompts needed
-    if structure_name:
-        # For hierarchical AI, use the structure to determine number of sections
-        if structure_name not in MUSICAL_STRUCTURES:
-            raise ValueError(f"Unknown structure: {structure_name}. Available: {list(MUSICAL_STRUCTURES.keys())}")
-        num_prompts = len(MUSICAL_STRUCTURES[structure_name])
-        structure_info = f" using a {structure_name} musical structure with {num_prompts} sections"
-    else:
-        # For sequential AI, use the specified number of clips
-        num_prompts = num_clips
-        structure_info = f" with {num_prompts} sequential parts"
+# Flipped off by --no-cache; guards both the whole-run and per-scene caches
+_prompt_cache_enabled = True
 
-    print(f"[AI] Generating {num_prompts} scene prompts using {model} with base prompt + sliding window approach...")
+# Flipped on by --per-section-prompts: skip the single structured call and
+# generate every scene prompt with its own request (for models without JSON mode)
+_force_per_section_prompts = False
 
-    # NEW APPROACH: Base prompt defines general setup, then scene prompts are added via sliding window
-    scene_prompts = []  # Scene-specific prompts that will be combined with base prompt
-    sliding_window_contexts = []  # Track the context used for each generation
+def _prompt_cache_key(base_prompt, num_prompts, structure_name, model):
+    payload = json.dumps([base_prompt, num_prompts, structure_name, model], sort_keys=True)
+    return hashlib.blake2b(payload.encode('utf-8')).hexdigest()
 
-    for i in range(num_prompts):
-        current_section = i + 1
-
-        # Create context from sliding window: current scene + last 2 scenes (max 3 total)
-        context_info = ""
-        previous_scene_list = []
-        if scene_prompts:
-            # For sliding window: include current scene + up to 2 previous scenes
-            # But exclude scenes that would make total > 3
-            total_available = len(scene_prompts) + 1  # +1 for current scene
-            if total_available <= 3:
-                # Include all previous scenes
-                scenes_to_include = scene_prompts
-            else:
-                # Include last 2 scenes to keep total at 3
-                scenes_to_include = scene_prompts[-2:]
-
-            if scenes_to_include:
-                context_info = f"\n\nPrevious scenes for continuity:\n"
-                for j, prev_scene in enumerate(scenes_to_include, len(scene_prompts) - len(scenes_to_include) + 1):
-                    context_info += f"Scene {j}: {prev_scene}\n"
-                    previous_scene_list.append(f"Scene {j}: {prev_scene}")
+def _load_cached_prompts(key):
+    if not _prompt_cache_enabled:
+        return None
+    try:
+        cached = json.loads((_PROMPT_CACHE_DIR / f"{key}.json").read_text(encoding='utf-8'))
+        contexts = [WindowCtx(**{**ctx, 'scene_slice': tuple(ctx['scene_slice'])})
+                    for ctx in cached['sliding_window_contexts']]
+        return cached['final_prompts'], contexts
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def _store_cached_prompts(key, final_prompts, sliding_window_contexts):
+    if not _prompt_cache_enabled:
+        return
+    try:
+        _PROMPT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        (_PROMPT_CACHE_DIR / f"{key}.json").write_text(json.dumps({
+            'final_prompts': final_prompts,
+            'sliding_window_contexts': [asdict(ctx) for ctx in sliding_window_contexts]
+        }), encoding='utf-8')
+    except OSError:
+        # Caching is best-effort; a read-only cache dir must not fail the run
+        pass
+
+def _scene_cache_connect():
+    _PROMPT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(_PROMPT_CACHE_DIR / "scene_cache.db")
+    conn.execute("CREATE TABLE IF NOT EXISTS scene_prompts (key TEXT PRIMARY KEY, value TEXT, ts REAL)")
+    return conn
+
+def _scene_cache_key(base_prompt, structure_info, num_prompts, current_section, previous_scene_list, model):
+    payload = json.dumps([base_prompt, structure_info, num_prompts, current_section,
+                          previous_scene_list, model], sort_keys=True)
+    return hashlib.blake2b(payload.encode('utf-8')).hexdigest()
+
+def _prompt_cache_lookup(key, max_age=None):
+    """
+    Return the cached scene prompt for `key`, or None on a miss or expired entry
+    """
+    if not _prompt_cache_enabled:
+        return None
+    try:
+        with _scene_cache_connect() as conn:
+            row = conn.execute("SELECT value, ts FROM scene_prompts WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if max_age is not None and time.time() - row[1] > max_age:
+            return None
+        return row[0]
+    except (sqlite3.Error, OSError):
+        return None
+
+def _prompt_cache_store(key, value):
+    if not _prompt_cache_enabled:
+        return
+    try:
+        with _scene_cache_connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO scene_prompts (key, value, ts) VALUES (?, ?, ?)",
+                         (key, value, time.time()))
+    except (sqlite3.Error, OSError):
+        # Caching is best-effort; a read-only cache dir must not fail the run
+        pass
+
+_OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+# Shared OpenRouter session: keep-alive skips the TCP + TLS handshake on every
+# call after the first, and transient 429/5xx responses are retried with backoff
+_openrouter_session = None
+
+def _get_openrouter_session(api_key):
+    global _openrouter_session
+    if _openrouter_session is None:
+        session = requests.Session()
+        session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            # Responses are tiny JSON; plain bodies skip the gzip inflate step
+            "Accept-Encoding": "identity"
+        })
+        session.mount("https://", HTTPAdapter(
+            pool_connections=4, pool_maxsize=8,
+            # urllib3 excludes POST from retries by default; these calls are
+            # all POSTs, so allow it explicitly (429/5xx never mean the
+            # completion was half-applied)
+            max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504],
+                              allowed_methods=frozenset({"POST"}))
+        ))
+        _openrouter_session = session
+    return _openrouter_session
 
-        # Create the AI prompt for this scene with context from previous scenes
-        system_prompt = """You are a creative music composition assistant. Your task is to generate a single scene-specific prompt that will be combined with a base prompt for music generation.
+# Hoisted out of the per-scene call path: these strings never change per run
+_SCENE_SYSTEM_PROMPT = """You are a creative music composition assistant. Your task is to generate a single scene-specific prompt that will be combined with a base prompt for music generation.
 
 Guidelines for creating the scene prompt:
 - Focus on scene-specific elements like mood shifts, tempo changes, instrumentation variations, or structural developments
@@ -684,94 +994,353 @@ Guidelines for creating the scene prompt:
 
 Return only the scene-specific prompt as a plain text string (do not include the base prompt)."""
 
-        user_prompt = f"""Create a scene-specific prompt for section {current_section} of {num_prompts} that will be combined with this base prompt: "{base_prompt}"{structure_info}
+def _generate_scene_prompts_batch(api_key, model, base_prompt, num_prompts, structure_info):
+    """
+    Ask the model for all scene prompts in one structured call
+    Returns (scene_prompts, user_prompt) or None when the structured output
+    cannot be obtained, so the caller can fall back to per-scene calls
+    """
+    system_prompt = """You are a creative music composition assistant. Your task is to generate a series of scene-specific prompts that will each be combined with a base prompt for music generation.
 
-This is scene {current_section} in the sequence.{context_info}
+Guidelines for creating the scene prompts:
+- Focus on scene-specific elements like mood shifts, tempo changes, instrumentation variations, or structural developments
+- Make each scene unique and creative while ensuring it flows from ALL previous scenes
+- Use descriptive language that complements the base prompt
+- Include specific musical terminology when appropriate
+- Keep each scene prompt concise but evocative (1 sentence)
+- Consider how each scene contributes to the overall musical journey
+- Ensure smooth transitions between scenes for maximum coherence
 
-The scene prompt should describe scene-specific elements that complement the base prompt and create a cohesive musical journey."""
+Return a JSON object of the form {"scenes": ["scene prompt 1", "scene prompt 2", ...]} with exactly the requested number of scene prompts, in order (do not include the base prompt)."""
 
-        # Store the full prompt sent to AI (including context)
-        full_ai_prompt = user_prompt
+    # Static template text leads, per-run values trail (prefix-cache friendly)
+    user_prompt = f"""Create the scene-specific prompts for every section of the composition. Each will be combined with the base prompt below, and should describe scene-specific elements that complement it and create a cohesive musical journey.
 
-        # Store the context used for this generation
-        sliding_window_contexts.append({
-            'section': current_section,
-            'previous_scenes': previous_scene_list.copy(),
-            'context_text': context_info.strip() if context_info else "No previous scenes (first scene)",
-            'full_ai_prompt': full_ai_prompt,
-            'base_prompt': base_prompt
-        })
+Base prompt: "{base_prompt}"
+Number of scenes: {num_prompts}{structure_info}"""
 
-        # Make API call to OpenRouter
-        url = "https://openrouter.ai/api/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
+    data = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        "temperature": 0.7,
+        "max_tokens": 200 + 100 * num_prompts,  # one sentence per scene plus JSON overhead
+        "response_format": {"type": "json_object"}
+    }
 
-        data = {
-            "model": model,
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt
-                }
-            ],
-            "temperature": 0.7,
-            "max_tokens": 300  # Shorter since we only need scene-specific content
-        }
+    try:
+        response = _get_openrouter_session(api_key).post(_OPENROUTER_URL, json=data, timeout=120)
+        response.raise_for_status()
 
-        try:
-            response = requests.post(url, headers=headers, json=data, timeout=60)
-            response.raise_for_status()
+        content = response.json()['choices'][0]['message']['content']
+        # Hand the socket back to the session pool right away
+        response.close()
+        scenes = [str(scene).strip() for scene in json.loads(content)["scenes"]]
 
-            result = response.json()
-            content = result['choices'][0]['message']['content'].strip()
+        if len(scenes) != num_prompts or any(len(scene) < 5 for scene in scenes):
+            raise ValueError(f"expected {num_prompts} scene prompts, got {len(scenes)}")
 
-            # Clean up the response (remove quotes if present)
-            if content.startswith('"') and content.endswith('"'):
-                content = content[1:-1]
-            if content.startswith("'") and content.endswith("'"):
-                content = content[1:-1]
+        for i, scene in enumerate(scenes, 1):
+            print(f"[AI] Generated scene {i}: {scene[:60]}...")
+        return scenes, user_prompt
 
-            # Ensure we got a reasonable prompt
-            if len(content) < 5:
-                raise ValueError("AI returned too short scene prompt")
+    except Exception as e:
+        print(f"[AI] Batched prompt generation failed ({e}); falling back to per-scene calls")
+        return None
 
-            print(f"[AI] Generated scene {current_section}: {content[:60]}...")
-            scene_prompts.append(content)
+@dataclass
+class WindowCtx:
+    """
+    Sliding-window record for one scene generation
+    The window itself is stored as (start, end) indices into the append-only
+    scene prompt list rather than a copied list of strings
+    """
+    section: int
+    scene_slice: tuple
+    context_text: str
+    full_ai_prompt: str
+    base_prompt: str
+
+    def previous_scenes(self, all_scenes):
+        """
+        Materialize the "Scene N: ..." lines for this window on demand
+        """
+        start, end = self.scene_slice
+        return [f"Scene {i + 1}: {all_scenes[i]}" for i in range(start, end)]
+
+def _build_window_contexts(base_prompt, scene_prompts, source_prompt):
+    """
+    Reconstruct the per-scene sliding-window records for documentation
+    """
+    contexts = []
+    for i in range(len(scene_prompts)):
+        window_start = max(0, i - 2)
+        previous_scene_list = [f"Scene {j + 1}: {scene_prompts[j]}" for j in range(window_start, i)]
 
-        except Exception as e:
-            print(f"[ERROR] Failed to generate AI scene prompt for section {current_section}: {e}")
-            # Fallback: create generic scene prompt for this section
-            fallback_scene = f"scene {current_section} continuing the musical development"
-            print(f"[AI] Using fallback scene prompt for section {current_section}")
-            scene_prompts.append(fallback_scene)
+        if previous_scene_list:
+            context_text = "Previous scenes for continuity:\n" + "\n".join(previous_scene_list)
+        else:
+            context_text = "No previous scenes (first scene)"
+
+        contexts.append(WindowCtx(
+            section=i + 1,
+            scene_slice=(window_start, i),
+            context_text=context_text,
+            full_ai_prompt=source_prompt,
+            base_prompt=base_prompt
+        ))
+
+    return contexts
+
+def _request_scene_prompt(api_key, model, user_prompt):
+    """
+    Make one OpenRouter call for a single scene prompt and return the cleaned content
+    """
+    # Built fresh per call: concurrent batch workers must not share one dict
+    data = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": _SCENE_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ],
+        "temperature": 0.7,
+        "max_tokens": 300,  # Shorter since we only need scene-specific content
+        "stream": True  # tokens arrive as SSE chunks so we can stop early
+    }
+
+    response = _get_openrouter_session(api_key).post(_OPENROUTER_URL, json=data, timeout=60, stream=True)
+    try:
+        response.raise_for_status()
+
+        # The prompt asks for one sentence; stop reading once we have it
+        # instead of waiting out any trailing filler the model generates
+        pieces = []
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data: "):
+                continue
+            payload = line[len("data: "):]
+            if payload == "[DONE]":
+                break
+            choices = json.loads(payload).get('choices')
+            if not choices:
+                continue
+            delta = choices[0].get('delta', {}).get('content')
+            if delta:
+                pieces.append(delta)
+                if re.search(r'[.!?](\s|$)', "".join(pieces)):
+                    break
+    finally:
+        # Release the connection back to the session pool
+        response.close()
+
+    content = "".join(pieces).strip()
+
+    # Clean up the response (remove a matching pair of surrounding quotes)
+    if len(content) >= 2 and content[0] == content[-1] and content[0] in ('"', "'"):
+        content = content[1:-1]
+
+    # Ensure we got a reasonable prompt
+    if len(content) < 5:
+        raise ValueError("AI returned too short scene prompt")
+
+    return content
+
+async def _fetch_scene_prompt(api_key, model, user_prompt, cache_key, current_section):
+    """
+    Return the scene prompt for one section, consulting the disk cache before
+    spending an OpenRouter call
+    """
+    cached = _prompt_cache_lookup(cache_key)
+    if cached is not None:
+        print(f"[AI] Using cached scene prompt for section {current_section}")
+        return cached
+
+    # requests is blocking, so each call runs in a worker thread
+    content = await asyncio.to_thread(_request_scene_prompt, api_key, model, user_prompt)
+    _prompt_cache_store(cache_key, content)
+    return content
+
+# Used when OpenRouter calls fail and no structure description is available:
+# varied fallbacks keep the clips from sounding nearly identical when several
+# sections fall back at once
+_GENERIC_FALLBACKS = (
+    "building intensity with layered instrumentation",
+    "a warm melodic passage developing the main theme",
+    "rhythmic development with driving momentum",
+    "a reflective interlude with softer dynamics",
+    "an energetic variation lifting the arrangement",
+)
+
+def _fallback_scene_prompt(structure_name, section_index):
+    """
+    Deterministic fallback scene prompt for a 0-based section index
+    Prefers the structure's own section description (the same text the
+    hierarchical strategy uses) over the generic rotation
+    """
+    if structure_name:
+        structure = MUSICAL_STRUCTURES.get(structure_name)
+        if structure and section_index < len(structure):
+            return structure[section_index][1].lower()
+    return _GENERIC_FALLBACKS[section_index % len(_GENERIC_FALLBACKS)]
+
+async def _generate_scene_prompts_per_section(api_key, model, base_prompt, num_prompts, structure_info, structure_name=None):
+    """
+    Generate scene prompts one OpenRouter call per section (sliding window)
+
+    Calls run in parallel batches: every scene in a batch sees the sliding
+    window as it stood when the batch started, so the network round-trips
+    overlap instead of paying full LLM latency per section
+    Returns (scene_prompts, sliding_window_contexts, used_fallback)
+    """
+    # Base prompt defines general setup, then scene prompts are added via sliding window
+    scene_prompts = []  # Scene-specific prompts that will be combined with base prompt
+    sliding_window_contexts = []  # Track the context used for each generation
+    used_fallback = False  # Whether any scene came from the fallback path
+    batch_size = max(1, int(os.getenv("OPENROUTER_PARALLEL_PROMPTS", "3")))
+
+    for batch_start in range(0, num_prompts, batch_size):
+        batch_sections = range(batch_start + 1, min(batch_start + batch_size, num_prompts) + 1)
+        batch_calls = []
+
+        for current_section in batch_sections:
+            # Create context from sliding window: current scene + last 2 scenes
+            # (max 3 total). Slicing past the start of a short list is safe, so
+            # [-2:] covers the warm-up iterations without a fill-state branch
+            context_info = ""
+            previous_scene_list = []
+            scenes_to_include = scene_prompts[-2:]
+            if scenes_to_include:
+                first_index = len(scene_prompts) - len(scenes_to_include) + 1
+                previous_scene_list = [f"Scene {j}: {prev_scene}"
+                                       for j, prev_scene in enumerate(scenes_to_include, first_index)]
+                # One join instead of a reallocation per scene line
+                context_info = "\n\nPrevious scenes for continuity:\n" + "\n".join(previous_scene_list) + "\n"
+
+            # Static template text leads, per-run values trail: a stable prefix lets
+            # provider-side prompt caching reuse the shared tokens across calls
+            user_prompt = f"""Create the scene-specific prompt for the next section of the composition. It will be combined with the base prompt below, and should describe scene-specific elements that complement it and create a cohesive musical journey.
+
+Base prompt: "{base_prompt}"
+Composition: scene {current_section} of {num_prompts}{structure_info}{context_info}"""
+
+            # Store the full prompt sent to AI (including context)
+            full_ai_prompt = user_prompt
+
+            # Store the context used for this generation; the window is kept
+            # as indices into scene_prompts instead of copying the list
+            sliding_window_contexts.append(WindowCtx(
+                section=current_section,
+                scene_slice=(len(scene_prompts) - len(previous_scene_list), len(scene_prompts)),
+                context_text=context_info.strip() if context_info else "No previous scenes (first scene)",
+                full_ai_prompt=full_ai_prompt,
+                base_prompt=base_prompt
+            ))
+
+            cache_key = _scene_cache_key(base_prompt, structure_info, num_prompts,
+                                         current_section, previous_scene_list, model)
+            batch_calls.append(_fetch_scene_prompt(api_key, model, user_prompt, cache_key, current_section))
+
+        results = await asyncio.gather(*batch_calls, return_exceptions=True)
+        for current_section, content in zip(batch_sections, results):
+            if isinstance(content, BaseException):
+                print(f"[ERROR] Failed to generate AI scene prompt for section {current_section}: {content}")
+                # Fallback: varied per section, so a flaky server doesn't
+                # yield a run of near-identical clips
+                fallback_scene = _fallback_scene_prompt(structure_name, current_section - 1)
+                print(f"[AI] Using fallback scene prompt for section {current_section}")
+                scene_prompts.append(fallback_scene)
+                used_fallback = True
+            else:
+                print(f"[AI] Generated scene {current_section}: {content[:60]}...")
+                scene_prompts.append(content)
+
+    return scene_prompts, sliding_window_contexts, used_fallback
+
+async def generate_ai_prompts(base_prompt, num_clips, structure_name=None):
+    """
+    Generate coherent and interesting prompts using OpenRouter AI with base prompt + sliding window scene approach
+    Uses a fixed base prompt for general music/song setup, then adds scene-specific prompts via sliding window
+    Returns both the final prompts and the sliding window context for documentation
+    """
+    # Load environment variables
+    load_dotenv()
+    api_key = os.getenv('OPENROUTER_API_KEY')
+    model = os.getenv('OPENROUTER_MODEL', 'x-ai/grok-4-fast')
+
+    if not api_key:
+        raise ValueError("OPENROUTER_API_KEY not found in .env file")
+
+    # Determine number of prompts needed
+    if structure_name:
+        # For hierarchical AI, use the structure to determine number of sections
+        if structure_name not in MUSICAL_STRUCTURES:
+            raise ValueError(f"Unknown structure: {structure_name}. Available: {list(MUSICAL_STRUCTURES.keys())}")
+        num_prompts = len(MUSICAL_STRUCTURES[structure_name])
+        structure_info = f" using a {structure_name} musical structure with {num_prompts} sections"
+    else:
+        # For sequential AI, use the specified number of clips
+        num_prompts = num_clips
+        structure_info = f" with {num_prompts} sequential parts"
+
+    # Nothing to generate: skip the cache and API machinery entirely
+    if num_prompts == 0:
+        return [], []
+
+    # Reuse cached prompts when the exact same request was generated before
+    cache_key = _prompt_cache_key(base_prompt, num_prompts, structure_name, model)
+    cached = _load_cached_prompts(cache_key)
+    if cached is not None:
+        final_prompts, sliding_window_contexts = cached
+        print(f"[AI] Using {len(final_prompts)} cached prompts (delete ~/.cache/musiccreator/prompts to regenerate)")
+        return final_prompts, sliding_window_contexts
+
+    print(f"[AI] Generating {num_prompts} scene prompts using {model} with base prompt + sliding window approach...")
+
+    # One structured call replaces num_prompts sequential roundtrips; the
+    # per-scene loop remains as fallback for models without JSON output,
+    # and --per-section-prompts forces it outright. A single scene gains
+    # nothing from JSON mode, so it goes straight to the plain-text call
+    if _force_per_section_prompts or num_prompts == 1:
+        batched = None
+    else:
+        batched = await asyncio.to_thread(_generate_scene_prompts_batch, api_key, model, base_prompt, num_prompts, structure_info)
+    if batched is not None:
+        scene_prompts, batch_prompt = batched
+        sliding_window_contexts = _build_window_contexts(base_prompt, scene_prompts, batch_prompt)
+        used_fallback = False
+    else:
+        scene_prompts, sliding_window_contexts, used_fallback = await _generate_scene_prompts_per_section(
+            api_key, model, base_prompt, num_prompts, structure_info, structure_name=structure_name)
 
     # Combine base prompt with each scene prompt to create final prompts
-    final_prompts = []
-    for scene_prompt in scene_prompts:
-        # Combine base prompt + scene prompt
-        combined_prompt = f"{base_prompt}, {scene_prompt}"
-        final_prompts.append(combined_prompt)
+    prefix = base_prompt + ", "
+    final_prompts = [prefix + scene_prompt for scene_prompt in scene_prompts]
 
     print(f"[AI] Successfully generated {len(final_prompts)} combined prompts using base prompt + sliding window scenes")
+    # Never cache a run containing fallback prompts: the cache has no TTL,
+    # so degraded results would keep being served after the API recovers
+    if not used_fallback:
+        _store_cached_prompts(cache_key, final_prompts, sliding_window_contexts)
     return final_prompts, sliding_window_contexts
 
-def generate_ai_sections(base_prompt, structure_name, seconds_per_section):
+async def generate_ai_sections(base_prompt, structure_name, seconds_per_section):
     """
     Generate section definitions for AI strategy with creative prompts
     """
-    if structure_name not in MUSICAL_STRUCTURES:
+    # Bind the structure once instead of looking it up per use
+    structure = MUSICAL_STRUCTURES.get(structure_name)
+    if structure is None:
         raise ValueError(f"Unknown structure: {structure_name}. Available: {list(MUSICAL_STRUCTURES.keys())}")
 
     # Calculate number of sections needed
-    num_sections = len(MUSICAL_STRUCTURES[structure_name])
+    num_sections = len(structure)
 
     # Generate AI prompts for each section
-    ai_prompts, sliding_window_contexts = generate_ai_prompts(base_prompt, num_sections, structure_name=structure_name)
+    ai_prompts, sliding_window_contexts = await generate_ai_prompts(base_prompt, num_sections, structure_name=structure_name)
 
     sections = []
-    structure = MUSICAL_STRUCTURES[structure_name]
 
     for i, (section_id, section_description) in enumerate(structure):
         sections.append({
@@ -783,6 +1352,106 @@ def generate_ai_sections(base_prompt, structure_name, seconds_per_section):
 
     return sections
 
+# Successful preflight checks leave a marker file whose mtime acts as a TTL,
+# so rapid re-runs skip the subprocess spawn and port probe entirely
+_CHECK_CACHE_DIR = Path.home() / ".cache" / "musiccreator"
+
+def _check_marker_fresh(name, ttl):
+    try:
+        return time.time() - (_CHECK_CACHE_DIR / name).stat().st_mtime < ttl
+    except OSError:
+        return False
+
+def _touch_check_marker(name):
+    try:
+        _CHECK_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        (_CHECK_CACHE_DIR / name).touch()
+    except OSError:
+        # Markers are best-effort; an unwritable cache dir just re-checks
+        pass
+
+def _check_musicgpt_server():
+    """
+    Probe the MusicGPT WebSocket port; returns True when it accepts connections
+    Cached for 30s — short, because the server can die between runs
+    """
+    if _check_marker_fresh("musicgpt_ok", 30):
+        return True
+
+    import socket
+    # 127.0.0.1 skips name resolution (localhost can try IPv6 first on some
+    # systems), and the short timeout bounds the wall time when the server is
+    # down instead of waiting out the OS connect timeout
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.settimeout(0.5)
+    try:
+        sock.connect(("127.0.0.1", 8642))
+    except OSError:
+        return False
+    finally:
+        sock.close()
+    _touch_check_marker("musicgpt_ok")
+    return True
+
+def _check_ffmpeg():
+    """
+    Check that FFmpeg can be spawned; returns True when available
+    Cached for an hour — an installed FFmpeg rarely disappears
+    """
+    if _check_marker_fresh("ffmpeg_ok", 3600):
+        return True
+
+    try:
+        result = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True)
+        if result.returncode != 0:
+            return False
+    except FileNotFoundError:
+        return False
+    _touch_check_marker("ffmpeg_ok")
+    return True
+
+# Preflight futures started in main() so the process spawn and TCP probe run
+# in background threads while AI prompt generation pays its network latency
+# Once the checks have passed, later compositions in the same process skip them
+_preflight_futures = None
+_PREFLIGHT_DONE = False
+
+def _start_preflight():
+    global _preflight_futures
+    if _PREFLIGHT_DONE or _preflight_futures is not None:
+        return
+    executor = ThreadPoolExecutor(max_workers=2)
+    _preflight_futures = (executor.submit(_check_musicgpt_server), executor.submit(_check_ffmpeg))
+    executor.shutdown(wait=False)
+
+def _await_preflight():
+    """
+    Collect the preflight results, exiting with the usual errors on failure
+    Memoized: checks run at most once per process
+    """
+    global _preflight_futures, _PREFLIGHT_DONE
+    if _PREFLIGHT_DONE:
+        return
+    if _preflight_futures is None:
+        # Programmatic callers that never went through main() still get checked
+        _start_preflight()
+
+    server_ok, ffmpeg_ok = (future.result() for future in _preflight_futures)
+    _preflight_futures = None
+    if not server_ok:
+        print("[ERROR] Cannot connect to MusicGPT WebSocket")
+        print("Start MusicGPT first: scripts\\run_musicgpt_cpu.bat")
+        sys.exit(1)
+    print("[OK] MusicGPT WebSocket accessible")
+
+    if not ffmpeg_ok:
+        print("[ERROR] FFmpeg not found. Please install FFmpeg for audio concatenation.")
+        print("Download from: https://ffmpeg.org/download.html")
+        sys.exit(1)
+    print("[OK] FFmpeg available for concatenation")
+
+    _PREFLIGHT_DONE = True
+
 def main():
     parser = argparse.ArgumentParser(
         description="Generate long-form music compositions using Strategy 1 (Sequential), Strategy 3 (Hierarchical), or Strategy AI (AI-Generated Prompts)",
@@ -823,17 +1492,33 @@ Examples:
                        help="Output directory for clips and final composition")
     parser.add_argument("-f", "--final-name", default="composition.wav",
                        help="Name of the final concatenated composition file")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Skip the on-disk AI prompt cache and always query OpenRouter")
+    parser.add_argument("--per-section-prompts", action="store_true",
+                       help="Generate AI scene prompts one API call per section instead of one batched call (for models without JSON output)")
 
     args = parser.parse_args()
 
+    if args.no_cache:
+        global _prompt_cache_enabled
+        _prompt_cache_enabled = False
+    if args.per_section_prompts:
+        global _force_per_section_prompts
+        _force_per_section_prompts = True
+
+    # Reject bad numeric arguments before any preflight or section building
+    if args.seconds_per_clip < 5:
+        print("[ERROR] Clip/section duration must be at least 5 seconds")
+        sys.exit(1)
+    if args.num_clips is not None and args.num_clips < 1:
+        print("[ERROR] Number of clips must be at least 1")
+        sys.exit(1)
+
     # Validate arguments based on strategy
     if args.strategy == "sequential":
         if not args.num_clips:
             print("[ERROR] --num-clips is required for sequential strategy")
             sys.exit(1)
-        if args.num_clips < 1:
-            print("[ERROR] Number of clips must be at least 1")
-            sys.exit(1)
         total_duration = args.num_clips * args.seconds_per_clip
         print(f"[INFO] Will generate {total_duration} seconds ({total_duration/60:.1f} minutes) of music")
         print(f"[INFO] Using {args.num_clips} clips of {args.seconds_per_clip} seconds each")
@@ -841,16 +1526,13 @@ Examples:
         # For AI strategy, determine if it's sequential or hierarchical based on --num-clips
         if args.num_clips:
             # AI sequential mode
-            if args.num_clips < 1:
-                print("[ERROR] Number of clips must be at least 1")
-                sys.exit(1)
             total_duration = args.num_clips * args.seconds_per_clip
             print(f"[INFO] Will generate {total_duration} seconds ({total_duration/60:.1f} minutes) of music")
             print(f"[INFO] Using AI strategy with {args.num_clips} sequential clips of {args.seconds_per_clip} seconds each")
         else:
-            # AI hierarchical mode
-            sections = generate_hierarchical_sections(args.prompt, args.structure, args.seconds_per_clip)
-            num_sections = len(sections)
+            # AI hierarchical mode (only the section count is needed here;
+            # the AI path builds its own section prompts later)
+            num_sections = len(MUSICAL_STRUCTURES[args.structure])
             total_duration = num_sections * args.seconds_per_clip
             print(f"[INFO] Will generate {total_duration} seconds ({total_duration/60:.1f} minutes) of music")
             print(f"[INFO] Using AI strategy with {args.structure} structure and {num_sections} sections of {args.seconds_per_clip} seconds each")
@@ -862,70 +1544,49 @@ Examples:
         print(f"[INFO] Will generate {total_duration} seconds ({total_duration/60:.1f} minutes) of music")
         print(f"[INFO] Using {args.structure} structure with {num_sections} sections of {args.seconds_per_clip} seconds each")
 
-    if args.seconds_per_clip < 5:
-        print("[ERROR] Clip/section duration must be at least 5 seconds")
-        sys.exit(1)
-
-    # Check if MusicGPT is running
-    import socket
-    try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.connect(("localhost", 8642))
-        sock.close()
-        print("[OK] MusicGPT WebSocket accessible")
-    except:
-        print("[ERROR] Cannot connect to MusicGPT WebSocket")
-        print("Start MusicGPT first: scripts\\run_musicgpt_cpu.bat")
-        sys.exit(1)
-
-    # Check if FFmpeg is available
-    try:
-        result = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True)
-        if result.returncode != 0:
-            raise FileNotFoundError
-        print("[OK] FFmpeg available for concatenation")
-    except FileNotFoundError:
-        print("[ERROR] FFmpeg not found. Please install FFmpeg for audio concatenation.")
-        print("Download from: https://ffmpeg.org/download.html")
-        sys.exit(1)
+    # Kick off the MusicGPT and FFmpeg checks in the background; results are
+    # collected right before clips are generated, after any AI prompt calls
+    _start_preflight()
 
     # Run the composition generation based on strategy
     if args.strategy == "sequential":
-        success = asyncio.run(generate_composition_sequential(
+        success = asyncio.run(_run_composition(generate_composition_sequential(
             args.prompt,
             args.num_clips,
             args.seconds_per_clip,
             args.output_dir,
             args.final_name
-        ))
+        )))
     elif args.strategy == "ai":
         # Determine AI mode based on --num-clips
         if args.num_clips:
             # AI sequential mode
-            success = asyncio.run(generate_composition_ai_sequential(
+            success = asyncio.run(_run_composition(generate_composition_ai_sequential(
                 args.prompt,
                 args.num_clips,
                 args.seconds_per_clip,
                 args.output_dir,
                 args.final_name
-            ))
+            )))
         else:
             # AI hierarchical mode
-            success = asyncio.run(generate_composition_ai_hierarchical(
+            success = asyncio.run(_run_composition(generate_composition_ai_hierarchical(
                 args.prompt,
                 args.structure,
                 args.seconds_per_clip,
                 args.output_dir,
                 args.final_name
-            ))
+            )))
     else:  # hierarchical
-        success = asyncio.run(generate_composition_hierarchical(
+        # Reuse the sections already built for the [INFO] summary above
+        success = asyncio.run(_run_composition(generate_composition_hierarchical(
             args.prompt,
             args.structure,
             args.seconds_per_clip,
             args.output_dir,
-            args.final_name
-        ))
+            args.final_name,
+            sections=sections
+        )))
 
     if success:
         print("\n✅ COMPOSITION GENERATION COMPLETE!")